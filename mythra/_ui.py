@@ -0,0 +1,24 @@
+from rich.console import Console
+from rich.theme import Theme
+
+# Create a custom theme for consistent, clean styling
+custom_theme = Theme(
+    {
+        "info": "dim cyan",
+        "success": "green",
+        "warning": "yellow",
+        "error": "bold red",
+        "highlight": "bold cyan",
+        "muted": "dim",
+        "title": "bold blue",
+        "subtitle": "blue",
+        "code_title": "bold cyan",
+        "optimization": "magenta",
+        "gas_saved": "green",
+        "file": "cyan",
+        "line": "dim",
+    }
+)
+
+# Shared by every module so terminal detection and the theme are set up once
+console = Console(highlight=False, theme=custom_theme)
@@ -1,19 +1,17 @@
 import asyncio
-import json
+import contextlib
+import hashlib
+import os
+import re
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 
+import orjson
 import typer
 from rich.console import Console
-from rich.progress import (
-    Progress,
-    SpinnerColumn,
-    TextColumn,
-    BarColumn,
-    TimeElapsedColumn,
-)
 from rich.rule import Rule
+from rich.style import Style
 
 # Import necessary functions from other modules
 # --- Temporarily simplify this import for debugging ---
@@ -30,51 +28,227 @@ from .llm import (
     create_gas_optimization_prompt,
     parse_llm_json_output,
     get_client_details_for_model,
+    llm_client,
+    estimate_tokens,
 )
 
+from . import cache
+from ._ui import console
+from .config import (
+    MAX_CONCURRENCY,
+    DEFAULT_MAX_CONCURRENCY,
+    MAX_CONCURRENT_FILE_READS,
+    MAX_FILE_BYTES,
+    MAX_FILE_LINES,
+    CHUNK_TOKEN_THRESHOLD,
+)
 from .display import display_results
 from .file_utils import find_solidity_files
 
-console = Console(highlight=False, theme=None)
+# Pre-built styles so per-file progress output skips Rich's markup parser
+_STATS_STYLE = Style(dim=True)
+_ERROR_STYLE = Style(color="red")
 
 
-async def analyze_single_file(
+# Requests in flight by cache key, so identical source sent concurrently costs one call
+_inflight: Dict[str, "asyncio.Future[Optional[str]]"] = {}
+
+
+# Top-level declarations used to split oversized files into independently analyzable chunks
+_TOP_LEVEL_DECLARATION_RE = re.compile(
+    r"^(?:abstract\s+)?(?:contract|library|interface)\s+\w+", re.MULTILINE
+)
+
+
+def split_solidity_top_level(solidity_code: str) -> List[Tuple[str, int, int]]:
+    """Splits Solidity source into one chunk per top-level contract/library/interface.
+
+    The preamble before the first declaration (pragma, imports, ...) is prepended to every
+    chunk. Returns (chunk_code, preamble_line_count, line_offset) tuples; a chunk line number
+    greater than preamble_line_count maps back to the original file by adding line_offset.
+    """
+    starts = [m.start() for m in _TOP_LEVEL_DECLARATION_RE.finditer(solidity_code)]
+    if len(starts) < 2:
+        return [(solidity_code, 0, 0)]
+
+    preamble = solidity_code[: starts[0]]
+    preamble_lines = preamble.count("\n")
+    chunks = []
+    for idx, start in enumerate(starts):
+        end = starts[idx + 1] if idx + 1 < len(starts) else len(solidity_code)
+        lines_before = solidity_code.count("\n", 0, start)
+        chunks.append(
+            (
+                preamble + solidity_code[start:end],
+                preamble_lines,
+                lines_before - preamble_lines,
+            )
+        )
+    return chunks
+
+
+async def _analyze_source(
     solidity_code: str,
-    model_name: str,
     file_name: Optional[str],
-    openai_key: Optional[str],
-    google_key: Optional[str],
-    anthropic_key: Optional[str],
+    client: Any,
+    client_type: str,
+    model_name: str,
+    semaphore: asyncio.Semaphore,
+    use_cache: bool = True,
+) -> Optional[List[Dict[str, Any]]]:
+    """Gets suggestions for one piece of source from the cache or the LLM.
+
+    Returns None if no usable response was obtained; only responses that parse are cached.
+    With use_cache=False the cached response is ignored, but the fresh one is still stored.
+    """
+    # Reuse a previous response for identical source + model + prompt version
+    cache_key = cache.make_key(model_name, solidity_code)
+    llm_response = cache.get(cache_key) if use_cache else None
+    if llm_response is not None:
+        # Parse in a worker thread; large responses would otherwise stall other in-flight calls
+        suggestions = await asyncio.to_thread(parse_llm_json_output, llm_response)
+        if suggestions is not None:
+            console.print(f"[dim]Using cached response for '{file_name}'.[/dim]")
+            return suggestions
+        # An unusable entry (stored before such replies counted as failures); request anew
+
+    if cache_key in _inflight:
+        # The same source is already being analyzed (e.g. a library repeated across
+        # flattened files); share that response instead of sending a duplicate request
+        llm_response = await asyncio.shield(_inflight[cache_key])
+        if llm_response is None:
+            return None  # The owning request already reported the failure
+        return await asyncio.to_thread(parse_llm_json_output, llm_response)
+
+    # Create the prompt (static system part + per-file user part)
+    system_prompt, prompt = create_gas_optimization_prompt(solidity_code, file_name)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[cache_key] = future
+    llm_response = None
+    try:
+        # Call the LLM API, holding a slot only while the request is in flight
+        async with semaphore:
+            llm_response = await call_llm_api(
+                client=client,
+                client_type=client_type,
+                model_name=model_name,
+                system_prompt=system_prompt,
+                prompt=prompt,
+            )
+    finally:
+        del _inflight[cache_key]
+        future.set_result(llm_response)  # None if the call failed or was cancelled
+
+    if llm_response is None:
+        console.print(
+            f"[bold red]LLM call failed to return content for {file_name} using {model_name}.[/bold red]"
+        )
+        return None
+
+    suggestions = await asyncio.to_thread(parse_llm_json_output, llm_response)
+    if suggestions is None:
+        # A reply without a JSON list is a failure, not "no optimizations"; don't persist it
+        console.print(
+            f"[bold red]LLM response for {file_name} using {model_name} contained no JSON list of suggestions.[/bold red]"
+        )
+        return None
+
+    # Store only the raw text so cached entries are re-parsed with the latest parser
+    cache.put(cache_key, llm_response)
+    return suggestions
+
+
+def _merge_chunk_suggestions(
+    chunks: List[Tuple[str, int, int]],
+    chunk_results: List[List[Dict[str, Any]]],
 ) -> List[Dict[str, Any]]:
-    """Analyzes a single Solidity code string for gas optimizations using the specified LLM."""
-    console.print(
-        f"Starting analysis for '{file_name or 'source code'}' using model '{model_name}'..."
-    )
+    """Maps chunk line numbers back to the original file and drops duplicate suggestions."""
+    merged = []
+    seen = set()
+    for (_, preamble_lines, line_offset), suggestions in zip(chunks, chunk_results):
+        for item in suggestions:
+            for line_key in ("start_line", "end_line"):
+                line = item.get(line_key)
+                if line is not None and line > preamble_lines:
+                    item[line_key] = line + line_offset
+            # The shared preamble can yield the same suggestion from several chunks
+            dedupe_key = (
+                item.get("description"),
+                item.get("start_line"),
+                item.get("end_line"),
+            )
+            if dedupe_key not in seen:
+                seen.add(dedupe_key)
+                merged.append(item)
+    return merged
+
+
+def _source_chunks(solidity_code: str) -> List[Tuple[str, int, int]]:
+    """Splits source above CHUNK_TOKEN_THRESHOLD by top-level declaration; otherwise one chunk."""
+    if estimate_tokens(solidity_code) > CHUNK_TOKEN_THRESHOLD:
+        return split_solidity_top_level(solidity_code)
+    return [(solidity_code, 0, 0)]
 
-    # Determine client type, API key, and potentially adjusted model name
-    client_type, api_key, validated_model_name = get_client_details_for_model(
-        model_name, openai_key, google_key, anthropic_key
-    )
 
-    # Create the prompt
-    prompt = create_gas_optimization_prompt(solidity_code, file_name)
+def _has_exact_response(model_name: str, solidity_code: str) -> bool:
+    """True if every chunk of the source has a cached or in-flight LLM response."""
+    for chunk_code, _, _ in _source_chunks(solidity_code):
+        key = cache.make_key(model_name, chunk_code)
+        if key not in _inflight and cache.get(key) is None:
+            return False
+    return True
 
-    # Call the LLM API
-    llm_response = await call_llm_api(
-        client_type=client_type,
-        api_key=api_key,
-        model_name=validated_model_name,
-        prompt=prompt,
+
+async def analyze_single_file(
+    solidity_code: str,
+    file_name: Optional[str],
+    client: Any,
+    client_type: str,
+    model_name: str,
+    semaphore: asyncio.Semaphore,
+    use_cache: bool = True,
+) -> Optional[List[Dict[str, Any]]]:
+    """Analyzes a single Solidity code string for gas optimizations using the specified LLM.
+
+    Returns None if the LLM call failed, so failures are not mistaken for "no optimizations".
+    Files larger than CHUNK_TOKEN_THRESHOLD are split by top-level declaration and the
+    chunks are analyzed concurrently, each taking its own slot in the semaphore.
+
+    The client, client type and validated model name are resolved once per run by the caller
+    (see get_client_details_for_model and llm_client).
+    """
+    console.print(
+        f"Starting analysis for '{file_name or 'source code'}' using model '{model_name}'..."
     )
 
-    if llm_response is None:
+    chunks = _source_chunks(solidity_code)
+    if len(chunks) > 1:
         console.print(
-            f"[bold red]LLM call failed to return content for {file_name} using {model_name}.[/bold red]"
+            f"[dim]Splitting '{file_name}' into {len(chunks)} parts by top-level declaration.[/dim]"
         )
-        return []
 
-    # Parse the response
-    parsed_suggestions = parse_llm_json_output(llm_response)
+    chunk_results = await asyncio.gather(
+        *(
+            _analyze_source(
+                chunk_code,
+                file_name,
+                client,
+                client_type,
+                model_name,
+                semaphore,
+                use_cache,
+            )
+            for chunk_code, _, _ in chunks
+        )
+    )
+    if any(result is None for result in chunk_results):
+        return None  # Report the whole file as failed rather than partially analyzed
+
+    if len(chunks) > 1:
+        parsed_suggestions = _merge_chunk_suggestions(chunks, chunk_results)
+    else:
+        parsed_suggestions = chunk_results[0]
     console.print(
         f"Analysis complete for '{file_name}'. Found {len(parsed_suggestions)} valid optimization suggestions."
     )
@@ -82,6 +256,127 @@ async def analyze_single_file(
     return parsed_suggestions
 
 
+async def _analyze_with_semantic_cache(
+    semantic: Any, solidity_code: str, digest: str, **analyze_kwargs
+) -> Optional[List[Dict[str, Any]]]:
+    """Reuses the suggestions of a near-identical, previously analyzed contract if there is one.
+
+    An exact cached (or in-flight) response is preferred and skips embedding entirely.
+    """
+    use_cache = analyze_kwargs.get("use_cache", True)
+    if use_cache and _has_exact_response(analyze_kwargs["model_name"], solidity_code):
+        return await analyze_single_file(solidity_code=solidity_code, **analyze_kwargs)
+
+    vector = await asyncio.to_thread(semantic.embed, solidity_code)
+    suggestions = semantic.lookup(vector, solidity_code) if use_cache else None
+    if suggestions is not None:
+        console.print(
+            f"[dim]Reusing results of a near-identical contract for '{analyze_kwargs['file_name']}'.[/dim]"
+        )
+        return suggestions
+
+    suggestions = await analyze_single_file(
+        solidity_code=solidity_code, **analyze_kwargs
+    )
+    if suggestions is not None:
+        semantic.add(vector, solidity_code, digest, suggestions)
+    return suggestions
+
+
+def _stat_and_read(
+    file_path: Path, ledger_entry: Optional[Dict[str, Any]], max_bytes: int
+) -> Tuple[os.stat_result, Optional[str], Optional[str]]:
+    """Stats a file and reads it, unless it is over max_bytes or the ledger shows it is unchanged.
+
+    Returns (stat, text, digest). Runs in a worker thread, so the content hash is computed
+    here too; hashlib releases the GIL, letting several files hash in parallel.
+    """
+    file_stat = file_path.stat()
+    if file_stat.st_size > max_bytes:
+        return file_stat, None, None
+    if file_stat.st_size == 0:
+        return file_stat, "", None  # Empty stubs are reported without opening them
+    if (
+        ledger_entry is not None
+        and ledger_entry.get("size") == file_stat.st_size
+        and ledger_entry.get("mtime_ns") == file_stat.st_mtime_ns
+    ):
+        return file_stat, None, None
+    data = file_path.read_bytes()
+    if b"\r" in data:
+        # Same newline translation as read_text; safe on bytes since UTF-8 never embeds \r
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return file_stat, data.decode("utf-8"), digest
+
+
+class _NullProgress:
+    """Stand-in for Progress when output is not a terminal (CI logs, pipes); nothing is redrawn."""
+
+    def __init__(self, console: Console):
+        self.console = console
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+    def add_task(self, *args, **kwargs) -> int:
+        return 0
+
+    def update(self, *args, **kwargs) -> None:
+        pass
+
+
+def _make_progress():
+    """Returns the live progress display, or a no-op stand-in when not on a terminal."""
+    if not console.is_terminal:
+        return _NullProgress(console)
+
+    # Deferred so `--help` and non-interactive runs don't pay for the progress widgets
+    from rich.progress import (
+        Progress,
+        SpinnerColumn,
+        TextColumn,
+        BarColumn,
+        TimeElapsedColumn,
+    )
+
+    return Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+        TextColumn("[info]{task.completed}/{task.total}[/info]"),
+        TimeElapsedColumn(),
+        TextColumn(
+            "{task.fields[optimizations]} opts | {task.fields[errors]} errors | last: {task.fields[last_file]}",
+            style=_STATS_STYLE,
+            markup=False,
+        ),
+        console=console,
+        refresh_per_second=4,
+    )
+
+
+def _analysis_metadata(
+    target_path: str,
+    files_to_analyze: List[Path],
+    all_results: Dict[str, Any],
+    errors_occurred: Dict[str, str],
+    model_name: str,
+) -> Dict[str, Any]:
+    return {
+        "cli_command": " ".join(sys.argv),
+        "target_path": target_path,
+        "files_analyzed_count": len(files_to_analyze),
+        "files_with_results_count": len(all_results),
+        "files_with_errors_count": len(errors_occurred),
+        "model_used": model_name,
+    }
+
+
 async def run_analysis(
     target_path: str,
     model_name: str,
@@ -89,12 +384,35 @@ async def run_analysis(
     google_api_key: Optional[str],
     anthropic_api_key: Optional[str],
     output_file: Optional[Path],
+    max_bytes: int = MAX_FILE_BYTES,
+    semantic_cache: bool = False,
+    output_format: Optional[str] = None,
+    use_cache: bool = True,
+    concurrency: Optional[int] = None,
 ):
     """
     Finds Solidity files, runs analysis asynchronously, displays results, and saves output.
+    Files larger than max_bytes are skipped without being read. With semantic_cache,
+    near-identical contracts reuse earlier suggestions (see SemanticCache).
+
+    output_format is "json" (one document written at the end) or "ndjson" (one record
+    per file, written as soon as it finishes). By default it follows the output suffix.
+
+    With use_cache=False, cached responses and ledger results are ignored and every file is
+    sent to the LLM; the new results still refresh the cache. concurrency overrides the
+    per-provider MAX_CONCURRENCY limit on in-flight LLM requests.
     """
     console.print(f"[info]Using model: [highlight]{model_name}[/highlight][/info]")
 
+    # Resolve the provider, API key and model name once and fail fast if unsupported
+    try:
+        client_type, api_key, validated_model_name = get_client_details_for_model(
+            model_name, openai_api_key, google_api_key, anthropic_api_key
+        )
+    except ValueError:
+        # get_client_details_for_model has already printed the reason
+        raise typer.Exit(code=1)
+
     # --- Find Files (Synchronous) ---
     console.print(
         f"[info]Searching for Solidity files in: [file]{target_path}[/file][/info]"
@@ -113,120 +431,269 @@ async def run_analysis(
     all_results = {}  # Store results by file path
     errors_occurred = {}  # Track files with errors
     total_optimizations = 0  # Count total optimizations found
-    skipped_files_count = 0  # Count skipped files
 
-    # Create a progress display
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-        TextColumn("[info]{task.completed}/{task.total}[/info]"),
-        TimeElapsedColumn(),
-        console=console,
-    ) as progress:
-        analysis_task_id = progress.add_task(
-            "[blue]Analyzing...", total=len(files_to_analyze)
+    if output_format is None and output_file is not None:
+        output_format = (
+            "ndjson" if output_file.suffix.lower() in (".ndjson", ".jsonl") else "json"
         )
+    ndjson_output = output_file is not None and output_format == "ndjson"
+
+    # Results of previous runs, keyed by absolute path, used to skip unchanged files
+    ledger = cache.load_ledger()
 
-        tasks = []
-        file_paths_for_tasks = []  # Keep track of file paths corresponding to tasks
+    semantic = None
+    if semantic_cache:
+        from .semantic_cache import SemanticCache
 
-        for file_path in files_to_analyze:
+        console.print("[info]Loading semantic cache...[/info]")
+        try:
+            semantic = await asyncio.to_thread(SemanticCache, validated_model_name)
+        except ImportError as e:
+            console.print(
+                f"[error]--semantic-cache needs the optional dependencies ({e.name}). "
+                "Install them with: pip install 'mythra\\[semantic]'[/error]"
+            )
+            raise typer.Exit(code=1)
+
+    # One client for the whole run, so connections are reused across files
+    async with llm_client(client_type, api_key) as client:
+
+        # Stream results to disk as they finish so an interrupted run keeps its progress
+        ndjson_file = None
+        if ndjson_output:
             try:
-                solidity_code = file_path.read_text(encoding="utf-8")
-                if not solidity_code.strip():
-                    errors_occurred[str(file_path)] = "Empty file"
-                    skipped_files_count += 1
-                    # Update progress immediately for skipped files
-                    progress.update(
-                        analysis_task_id,
-                        completed=skipped_files_count,  # Advance based on skipped count initially
-                        description=f"[blue]Skipped empty: [dim]{file_path.name}[/dim]",
+                ndjson_file = open(output_file, "wb")
+            except OSError as e:
+                console.print(
+                    f"[bold red]Error:[/bold red] Failed to open output file [cyan]{output_file}[/cyan]: {e}"
+                )
+                raise typer.Exit(code=1)
+
+        # Create a progress display
+        with ndjson_file or contextlib.nullcontext(), _make_progress() as progress:
+            analysis_task_id = progress.add_task(
+                "[blue]Analyzing...",
+                total=len(files_to_analyze),
+                optimizations=0,
+                errors=0,
+                last_file="",
+            )
+
+            def _advance(count: int, file_name: str):
+                # Only plain task fields change per file; they are rendered at the refresh rate
+                progress.update(
+                    analysis_task_id,
+                    advance=count,
+                    optimizations=total_optimizations,
+                    errors=len(errors_occurred),
+                    last_file=file_name,
+                )
+
+            # Bound the number of in-flight LLM requests to stay under provider rate limits
+            if concurrency is None:
+                model_name_lower = model_name.lower()
+                concurrency = next(
+                    (
+                        limit
+                        for prefix, limit in MAX_CONCURRENCY.items()
+                        if prefix in model_name_lower
+                    ),
+                    DEFAULT_MAX_CONCURRENCY,
+                )
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def _tagged(tag, coro):
+                # Pair each result (or exception) with its tag so completion order doesn't matter
+                try:
+                    return tag, await coro
+                except Exception as e:
+                    return tag, e
+
+            def _write_record(record: Dict[str, Any]):
+                ndjson_file.write(orjson.dumps(record) + b"\n")
+                ndjson_file.flush()
+
+            def _record(paths: List[Path], suggestions: List[Dict[str, Any]]):
+                nonlocal total_optimizations
+                for file_path in paths:
+                    total_optimizations += len(suggestions)
+                    all_results[str(file_path)] = {"optimizations": suggestions}
+                    if ndjson_file is not None:
+                        _write_record(
+                            {"file": str(file_path), "optimizations": suggestions}
+                        )
+
+            read_semaphore = asyncio.Semaphore(MAX_CONCURRENT_FILE_READS)
+
+            async def _read_source(
+                file_path: Path, ledger_entry: Optional[Dict[str, Any]]
+            ):
+                # Read in a worker thread so disk I/O never stalls in-flight LLM calls
+                async with read_semaphore:
+                    return await asyncio.to_thread(
+                        _stat_and_read, file_path, ledger_entry, max_bytes
+                    )
+
+            ledger_entries = {
+                file_path: (
+                    cache.ledger_lookup(
+                        ledger, os.path.abspath(file_path), validated_model_name
+                    )
+                    if use_cache
+                    else None
+                )
+                for file_path in files_to_analyze
+            }
+            read_tasks = [
+                asyncio.create_task(
+                    _tagged(file_path, _read_source(file_path, ledger_entry))
+                )
+                for file_path, ledger_entry in ledger_entries.items()
+            ]
+
+            # Start each analysis as soon as its file has been read. Byte-identical files
+            # (e.g. vendored libraries) are analyzed once and share the result.
+            paths_by_digest: Dict[str, List[Path]] = {}
+            file_stats: Dict[Path, os.stat_result] = {}
+            tasks = []
+            for next_read in asyncio.as_completed(read_tasks):
+                file_path, read_result = await next_read
+
+                if isinstance(read_result, Exception):
+                    errors_occurred[str(file_path)] = f"Read error: {read_result}"
+                    progress.console.print(
+                        f"Read error: {file_path}: {read_result}",
+                        style=_ERROR_STYLE,
+                        markup=False,
+                    )
+                    _advance(1, file_path.name)
+                    continue  # Skip adding a task
+
+                file_stat, solidity_code, digest = read_result
+                if file_stat.st_size > max_bytes:
+                    errors_occurred[str(file_path)] = (
+                        f"Skipped: {file_stat.st_size} bytes > limit of {max_bytes}"
                     )
+                    _advance(1, file_path.name)
+                    continue
+
+                ledger_entry = ledger_entries[file_path]
+                if solidity_code is None:
+                    # Size and mtime match the ledger; reuse the suggestions without reading
+                    _record([file_path], ledger_entry["suggestions"])
+                    _advance(1, file_path.name)
+                    continue
+
+                if not solidity_code or solidity_code.isspace():
+                    errors_occurred[str(file_path)] = "Empty file"
+                    _advance(1, file_path.name)
                     continue  # Skip adding a task for this file
 
+                # A final line without a trailing "\n" still counts
+                line_count = solidity_code.count("\n") + (
+                    not solidity_code.endswith("\n")
+                )
+                if line_count > MAX_FILE_LINES:
+                    errors_occurred[str(file_path)] = (
+                        f"Skipped: {line_count} lines > limit of {MAX_FILE_LINES}"
+                    )
+                    _advance(1, file_path.name)
+                    continue
+
+                if ledger_entry is not None and ledger_entry.get("digest") == digest:
+                    # Touched but unchanged content; refresh the entry's size and mtime
+                    ledger[os.path.abspath(file_path)] = cache.make_ledger_entry(
+                        file_stat,
+                        digest,
+                        validated_model_name,
+                        ledger_entry["suggestions"],
+                    )
+                    _record([file_path], ledger_entry["suggestions"])
+                    _advance(1, file_path.name)
+                    continue
+
+                file_stats[file_path] = file_stat
+                if digest in paths_by_digest:
+                    paths_by_digest[digest].append(file_path)
+                    continue
+                paths_by_digest[digest] = [file_path]
+
                 # Create the coroutine for analysis
-                coro = analyze_single_file(
-                    solidity_code=solidity_code,
-                    model_name=model_name,
+                analyze_kwargs = dict(
                     file_name=file_path.name,
-                    openai_key=openai_api_key,
-                    google_key=google_api_key,
-                    anthropic_key=anthropic_api_key,
+                    client=client,
+                    client_type=client_type,
+                    model_name=validated_model_name,
+                    semaphore=semaphore,
+                    use_cache=use_cache,
                 )
-                tasks.append(coro)  # Append the coroutine
-                file_paths_for_tasks.append(file_path)  # Store corresponding path
+                if semantic is not None:
+                    coro = _analyze_with_semantic_cache(
+                        semantic, solidity_code, digest, **analyze_kwargs
+                    )
+                else:
+                    coro = analyze_single_file(
+                        solidity_code=solidity_code, **analyze_kwargs
+                    )
+                tasks.append(asyncio.create_task(_tagged(digest, coro)))
 
-            except Exception as e:
-                errors_occurred[str(file_path)] = f"Read error: {e}"
-                skipped_files_count += 1
-                # Update progress immediately for read errors
-                progress.update(
-                    analysis_task_id,
-                    completed=skipped_files_count,
-                    description=f"[red]Read error: [dim]{file_path.name}[/dim]",
-                )
-                continue  # Skip adding a task
-
-        # --- Execute tasks concurrently using asyncio.gather ---
-        processed_task_count = 0
-        if tasks:
-            # return_exceptions=True allows gather to complete even if some tasks fail
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # --- Process results from gather ---
-            for i, result in enumerate(results):
-                file_path = file_paths_for_tasks[i]
-                file_path_str = str(file_path)
-                file_name = file_path.name
-                # Increment progress based on processed tasks + previously skipped files
-                current_progress = skipped_files_count + processed_task_count + 1
+            # --- Execute tasks concurrently, processing each result as soon as it finishes ---
+            for next_done in asyncio.as_completed(tasks):
+                digest, result = await next_done
+                group_paths = paths_by_digest[digest]  # Every file sharing this content
 
                 if isinstance(result, Exception):
-                    # Handle exceptions returned by gather
-                    errors_occurred[file_path_str] = f"Analysis error: {result}"
-                    progress.update(
-                        analysis_task_id,
-                        completed=current_progress,
-                        description=f"[red]Analysis error: [yellow]{file_name}[/yellow]",
+                    for file_path in group_paths:
+                        errors_occurred[str(file_path)] = f"Analysis error: {result}"
+                    progress.console.print(
+                        f"Analysis error: {group_paths[0]}: {result}",
+                        style=_ERROR_STYLE,
+                        markup=False,
                     )
                 elif result is not None:  # Successful analysis run
-                    opt_count = len(result)
-                    if opt_count > 0:
-                        total_optimizations += opt_count
-                        all_results[file_path_str] = {"optimizations": result}
-                        progress.update(
-                            analysis_task_id,
-                            completed=current_progress,
-                            description=f"[success]Found {opt_count} opts: [file]{file_name}[/file][/success]",
-                        )
-                    else:
-                        all_results[file_path_str] = {"optimizations": []}
-                        progress.update(
-                            analysis_task_id,
-                            completed=current_progress,
-                            description=f"[muted]No optimizations: [file]{file_name}[/file][/muted]",
+                    _record(group_paths, result)
+                    for file_path in group_paths:
+                        ledger[os.path.abspath(file_path)] = cache.make_ledger_entry(
+                            file_stats[file_path],
+                            digest,
+                            validated_model_name,
+                            result,
                         )
                 else:  # analyze_single_file returned None (explicit failure)
-                    errors_occurred[file_path_str] = (
-                        "Analysis failed (LLM error or no content)"
-                    )
-                    progress.update(
-                        analysis_task_id,
-                        completed=current_progress,
-                        description=f"[red]Analysis failed: [yellow]{file_name}[/yellow]",
+                    for file_path in group_paths:
+                        errors_occurred[str(file_path)] = (
+                            "Analysis failed (LLM error or no content)"
+                        )
+                    progress.console.print(
+                        f"Analysis failed: {group_paths[0]}",
+                        style=_ERROR_STYLE,
+                        markup=False,
                     )
-                processed_task_count += 1  # Increment count of processed tasks
+                _advance(len(group_paths), group_paths[0].name)
+
+            # Final progress description
+            progress.update(
+                analysis_task_id, description="[green]Analysis Complete[/green]"
+            )
 
-        # Ensure progress bar completes fully if only skipped files were encountered
-        if not tasks and skipped_files_count > 0:
-            progress.update(analysis_task_id, completed=len(files_to_analyze))
+            if ndjson_file is not None:
+                for file_path_str, error in errors_occurred.items():
+                    _write_record({"file": file_path_str, "error": error})
+                _write_record(
+                    {
+                        "analysis_metadata": _analysis_metadata(
+                            target_path,
+                            files_to_analyze,
+                            all_results,
+                            errors_occurred,
+                            model_name,
+                        )
+                    }
+                )
 
-        # Final progress description
-        progress.update(
-            analysis_task_id, description="[green]Analysis Complete[/green]"
-        )
+    cache.save_ledger(ledger)
+    if semantic is not None:
+        semantic.save()
 
     # --- Display Combined Results ---
     console.rule("[title]Analysis Summary[/title]")
@@ -252,26 +719,33 @@ async def run_analysis(
             )
 
     # --- Save aggregated results if requested ---
-    if output_file:
+    if ndjson_output:
+        console.print(
+            f"\n[green]Results streamed to [cyan]{output_file}[/cyan].[/green]"
+        )
+    elif output_file:
         console.print(f"\nSaving aggregated results to [cyan]{output_file}[/cyan]...")
         try:
-            sorted_all_results = dict(sorted(all_results.items()))
-            sorted_errors = dict(sorted(errors_occurred.items()))
-
             output_data = {
-                "analysis_metadata": {
-                    "cli_command": " ".join(sys.argv),
-                    "target_path": target_path,
-                    "files_analyzed_count": len(files_to_analyze),
-                    "files_with_results_count": len(sorted_all_results),
-                    "files_with_errors_count": len(sorted_errors),
-                    "model_used": model_name,
-                },
-                "results_by_file": sorted_all_results,
-                "errors_by_file": sorted_errors,
+                "analysis_metadata": _analysis_metadata(
+                    target_path,
+                    files_to_analyze,
+                    all_results,
+                    errors_occurred,
+                    model_name,
+                ),
+                "results_by_file": all_results,
+                "errors_by_file": errors_occurred,
             }
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(output_data, f, indent=2, ensure_ascii=False)
+            # orjson serializes straight to bytes and sorts keys itself, so the result
+            # dicts don't need to be copied into sorted order first
+            with open(output_file, "wb") as f:
+                f.write(
+                    orjson.dumps(
+                        output_data,
+                        option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS,
+                    )
+                )
             console.print(f"[green]Results successfully saved.[/green]")
         except IOError as e:
             console.print(
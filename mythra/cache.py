@@ -0,0 +1,130 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import orjson
+
+from .config import CACHE_TTL_SECONDS, LEDGER_PATH, LLM_CACHE_DIR, PROMPT_VERSION
+
+
+def make_key(model_name: str, solidity_code: str) -> str:
+    """Builds the content-addressed cache key for a model + source combination."""
+    return hashlib.sha256(
+        f"{model_name}\0{PROMPT_VERSION}\0{solidity_code}".encode("utf-8")
+    ).hexdigest()
+
+
+def _entry_path(key: str) -> Path:
+    return LLM_CACHE_DIR / key[:2] / f"{key}.json"
+
+
+def read_json(path: Path) -> Any:
+    """Reads a JSON cache file; raises OSError or ValueError if missing or corrupt."""
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def write_json(path: Path, data: Any) -> None:
+    """Atomically writes a JSON cache file, ignoring filesystem and encoding errors."""
+    try:
+        encoded = orjson.dumps(data)
+    except orjson.JSONEncodeError:
+        return  # e.g. an integer wider than 64 bits parsed from an LLM response
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(encoded)
+        # Atomic rename so concurrent runs never see partial entries
+        os.replace(tmp_path, path)
+    except OSError:
+        # Caching is best-effort; never fail an analysis because the cache is unwritable
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+
+def _expired(created: Any) -> bool:
+    # Entries written before timestamps were recorded count as expired
+    return (
+        not isinstance(created, (int, float))
+        or time.time() - created > CACHE_TTL_SECONDS
+    )
+
+
+def get(key: str) -> Optional[str]:
+    """Returns the cached raw LLM response for the key, or None on a miss."""
+    try:
+        entry = read_json(_entry_path(key))
+    except (OSError, ValueError):
+        return None  # Missing or corrupt entries are treated as misses
+    if not isinstance(entry, dict) or _expired(entry.get("created")):
+        return None
+    response = entry.get("response")
+    return response if isinstance(response, str) else None
+
+
+def put(key: str, response: str) -> None:
+    """Stores the raw LLM response text so later runs can skip the API call."""
+    write_json(_entry_path(key), {"response": response, "created": time.time()})
+
+
+def load_ledger() -> Dict[str, Dict[str, Any]]:
+    """Loads the ledger mapping absolute file paths to their last analysis results."""
+    try:
+        ledger = read_json(LEDGER_PATH)
+    except (OSError, ValueError):
+        return {}
+    return ledger if isinstance(ledger, dict) else {}
+
+
+def save_ledger(ledger: Dict[str, Dict[str, Any]]) -> None:
+    """Persists the ledger for the next run, dropping expired entries and deleted files."""
+    write_json(
+        LEDGER_PATH,
+        {
+            path_key: entry
+            for path_key, entry in ledger.items()
+            if isinstance(entry, dict)
+            and not _expired(entry.get("analyzed_at"))
+            and os.path.exists(path_key)
+        },
+    )
+
+
+def ledger_lookup(
+    ledger: Dict[str, Dict[str, Any]], path_key: str, model_name: str
+) -> Optional[Dict[str, Any]]:
+    """Returns the ledger entry for a path if it was produced by this model and prompt version."""
+    entry = ledger.get(path_key)
+    # A malformed entry (hand-edited or from an older format) is treated as a miss
+    if (
+        isinstance(entry, dict)
+        and isinstance(entry.get("size"), int)
+        and isinstance(entry.get("mtime_ns"), int)
+        and isinstance(entry.get("digest"), str)
+        and isinstance(entry.get("suggestions"), list)
+        and entry.get("model") == model_name
+        and entry.get("prompt_version") == PROMPT_VERSION
+        and not _expired(entry.get("analyzed_at"))
+    ):
+        return entry
+    return None
+
+
+def make_ledger_entry(
+    stat: os.stat_result, digest: str, model_name: str, suggestions: list
+) -> Dict[str, Any]:
+    """Builds a ledger entry recording the file state that produced the suggestions."""
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "digest": digest,
+        "model": model_name,
+        "prompt_version": PROMPT_VERSION,
+        "suggestions": suggestions,
+        "analyzed_at": time.time(),
+    }
@@ -1,20 +1,42 @@
 import typer
 import asyncio
-import questionary
-from rich.console import Console
+import sys
+from enum import Enum
 from typing import Optional, Annotated
 from pathlib import Path
 
 # Import necessary components from other modules
-from .config import SUPPORTED_MODELS
-from .analyzer import run_analysis
+from ._ui import console
+from .config import SUPPORTED_MODELS, MAX_FILE_BYTES, LAST_MODEL_PATH
 
 app = typer.Typer(
     name="mythra-gas",
     help="Mythra Gas Optimizer CLI - Analyzes Solidity files or directories for gas optimizations using LLMs.",
     add_completion=False,
 )
-console = Console(highlight=False, theme=None)
+
+
+class OutputFormat(str, Enum):
+    json = "json"
+    ndjson = "ndjson"
+
+
+def _load_last_model() -> Optional[str]:
+    """Returns the model used by the last successful run, if it is still supported."""
+    try:
+        last_model = LAST_MODEL_PATH.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    return last_model if last_model in SUPPORTED_MODELS else None
+
+
+def _save_last_model(model_name: str) -> None:
+    """Remembers the model so later runs can default to it."""
+    try:
+        LAST_MODEL_PATH.parent.mkdir(parents=True, exist_ok=True)
+        LAST_MODEL_PATH.write_text(model_name, encoding="utf-8")
+    except OSError:
+        pass  # Remembering the model is a convenience; never fail the run over it
 
 
 # --- Synchronous Command Entry Point ---
@@ -31,7 +53,8 @@ def analyze(
         typer.Option(
             "--model",
             "-m",
-            help=f"LLM model to use for analysis. If omitted, you will be prompted.",
+            help="LLM model to use for analysis. Overrides MYTHRA_MODEL env var. If omitted, you will be prompted (non-interactive runs reuse the last model).",
+            envvar="MYTHRA_MODEL",
             rich_help_panel="Model Selection",
         ),
     ] = None,
@@ -75,13 +98,70 @@ def analyze(
             rich_help_panel="Output Options",
         ),
     ] = None,
+    output_format: Annotated[
+        Optional[OutputFormat],
+        typer.Option(
+            "--output-format",
+            case_sensitive=False,
+            help="Format of --output: 'json' (written at the end) or 'ndjson' (one line per file, written as each finishes). Defaults to ndjson for .ndjson/.jsonl paths, json otherwise.",
+            rich_help_panel="Output Options",
+        ),
+    ] = None,
+    max_bytes: Annotated[
+        int,
+        typer.Option(
+            "--max-bytes",
+            min=1,
+            help="Skip Solidity files larger than this many bytes (e.g. flattened or generated contracts).",
+            rich_help_panel="Analysis Options",
+        ),
+    ] = MAX_FILE_BYTES,
+    semantic_cache: Annotated[
+        bool,
+        typer.Option(
+            "--semantic-cache",
+            help="Reuse results for contracts that differ only in comments, formatting or small edits. Requires 'pip install mythra\\[semantic]'.",
+            rich_help_panel="Analysis Options",
+        ),
+    ] = False,
+    no_cache: Annotated[
+        bool,
+        typer.Option(
+            "--no-cache",
+            help="Ignore cached LLM responses and previous results; re-analyze every file and refresh the cache.",
+            rich_help_panel="Analysis Options",
+        ),
+    ] = False,
+    concurrency: Annotated[
+        Optional[int],
+        typer.Option(
+            "--concurrency",
+            "-j",
+            min=1,
+            envvar="MYTHRA_CONCURRENCY",
+            help="Maximum LLM requests in flight at once. Defaults to a per-provider limit (OpenAI/Gemini 8, Anthropic 4). Overrides MYTHRA_CONCURRENCY env var.",
+            rich_help_panel="Analysis Options",
+        ),
+    ] = None,
 ):
     """
     Analyzes Solidity files found in the target path/pattern for gas optimizations.
     """
     # --- Handle Model Selection Synchronously FIRST ---
     selected_model_name = model_name
+    last_model = _load_last_model() if model_name is None else None
+    if selected_model_name is None and last_model and not sys.stdin.isatty():
+        # Scripts and CI can't answer a prompt; reuse the last successful model instead
+        selected_model_name = last_model
+        console.print(f"Using last model: [cyan]{selected_model_name}[/cyan]")
+
     if selected_model_name is None:
+        # Imported lazily: questionary pulls in prompt_toolkit, which is slow to import
+        import questionary
+
+        default_model = last_model or (
+            SUPPORTED_MODELS[0] if SUPPORTED_MODELS else None
+        )
         console.print(
             "[bold yellow]Model not specified. Please select a model:[/bold yellow]"
         )
@@ -109,7 +189,7 @@ def analyze(
             selected_model_name = questionary.select(
                 "Select a model to use:",
                 choices=choices,
-                default=SUPPORTED_MODELS[0] if SUPPORTED_MODELS else None,
+                default=default_model,
             ).ask()
 
             if not selected_model_name:  # User pressed Ctrl+C in questionary
@@ -128,7 +208,7 @@ def analyze(
 
             selected_model_name = typer.prompt(
                 "Enter the model name to use",
-                default=SUPPORTED_MODELS[0] if SUPPORTED_MODELS else None,
+                default=default_model,
                 show_default=True,
             )
 
@@ -147,14 +227,13 @@ def analyze(
         console.print(f"Supported models are: {', '.join(SUPPORTED_MODELS)}")
         raise typer.Exit(code=1)
 
-    # Create a new event loop and run the async analysis function in it
-    try:
-        # Create a new event loop
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    # Deferred so `--help` and argument errors don't load the analysis and display modules
+    from .analyzer import run_analysis
 
-        # Run the async function from the analyzer module
-        loop.run_until_complete(
+    # Run the async analysis; asyncio.run cancels pending tasks and shuts down
+    # async generators and the default executor on exit, including on Ctrl+C
+    try:
+        asyncio.run(
             run_analysis(
                 target_path=target_path,
                 model_name=selected_model_name,  # Pass the selected model name
@@ -162,24 +241,25 @@ def analyze(
                 google_api_key=google_api_key,
                 anthropic_api_key=anthropic_api_key,
                 output_file=output_file,
+                max_bytes=max_bytes,
+                semantic_cache=semantic_cache,
+                output_format=output_format.value if output_format else None,
+                use_cache=not no_cache,
+                concurrency=concurrency,
             )
         )
+        _save_last_model(selected_model_name)
     except KeyboardInterrupt:
         console.print("\n[bold yellow]Analysis interrupted by user.[/bold yellow]")
         raise typer.Exit(code=130)  # Standard exit code for SIGINT
+    except typer.Exit:
+        raise  # run_analysis has already reported the problem
     except Exception as e:
         console.print(f"\n[bold red]Error during analysis:[/bold red] {e}")
         # Consider adding traceback here for debugging if needed
         # import traceback
         # traceback.print_exc()
         raise typer.Exit(code=1)
-    finally:
-        # Clean up the event loop
-        if "loop" in locals() and loop.is_running():
-            loop.stop()
-        if "loop" in locals():
-            loop.close()
-            asyncio.set_event_loop(None)
 
 
 # --- Main Execution Guard ---
@@ -1,4 +1,6 @@
 import os
+from pathlib import Path
+
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -28,3 +30,43 @@ SUPPORTED_MODELS = [
 LLM_TIMEOUT = 90  # Timeout for LLM calls in seconds
 LLM_MAX_RETRIES = 2
 LLM_RETRY_DELAY_BASE = 2  # Base delay for exponential backoff in seconds
+# Response token caps; large enough for a full suggestion list, since a cut-off list is lost
+LLM_MAX_OUTPUT_TOKENS = 4000
+GEMINI_MAX_OUTPUT_TOKENS = 8192
+# JSON lists extracted from malformed LLM output above this size are dropped unparsed
+MAX_LLM_JSON_CANDIDATE_CHARS = 512 * 1024
+
+# Maximum number of in-flight LLM requests, keyed by model prefix (tuned to provider rate limits)
+MAX_CONCURRENCY = {"gpt-": 8, "claude-": 4, "gemini-": 8}
+DEFAULT_MAX_CONCURRENCY = 4
+MAX_CONCURRENT_FILE_READS = 64  # Caps open file descriptors when reading large repos
+
+# Files above these limits (usually flattened or generated contracts) are skipped
+MAX_FILE_BYTES = 200 * 1024  # Overridable with --max-bytes
+MAX_FILE_LINES = 5000
+# Files estimated above this many tokens are split by top-level contract/library/interface
+CHUNK_TOKEN_THRESHOLD = 12000
+
+# --- User Settings ---
+CONFIG_DIR = Path(
+    os.environ.get("MYTHRA_CONFIG_DIR") or Path.home() / ".config" / "mythra"
+)
+LAST_MODEL_PATH = CONFIG_DIR / "last_model"  # Model used by the last successful run
+
+# --- Caching ---
+# Bump whenever create_gas_optimization_prompt changes so stale cached responses are ignored
+PROMPT_VERSION = 2
+CACHE_DIR = Path(
+    os.environ.get("MYTHRA_CACHE_DIR") or Path.home() / ".cache" / "mythra"
+)
+LLM_CACHE_DIR = CACHE_DIR / "llm"  # Raw LLM responses keyed by content hash
+LEDGER_PATH = CACHE_DIR / "ledger.json"  # Per-path results of the last analysis
+# Cached responses and ledger results expire after this
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# --- Semantic Cache (optional, --semantic-cache) ---
+SEMANTIC_CACHE_DIR = CACHE_DIR / "sem"  # Embeddings of previously analyzed contracts
+SEMANTIC_CACHE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"  # Local embedding model
+SEMANTIC_CACHE_THRESHOLD = 0.97  # Minimum cosine similarity to reuse suggestions
+# Normalized source is embedded in windows of this size
+SEMANTIC_CACHE_WINDOW_CHARS = 1000
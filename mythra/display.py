@@ -1,44 +1,93 @@
 import re
 import sys
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Any, Dict, List, Optional, Tuple
 
-from rich.console import Console, Group
+from rich.console import Group
 from rich.panel import Panel
 from rich.table import Table
 from rich.syntax import Syntax
 from rich.padding import Padding
 from rich.text import Text
 from rich.rule import Rule
-from rich.theme import Theme
 from rich.box import ROUNDED
 
-# Create a custom theme for consistent, clean styling
-custom_theme = Theme(
-    {
-        "info": "dim cyan",
-        "success": "green",
-        "warning": "yellow",
-        "error": "bold red",
-        "highlight": "bold cyan",
-        "muted": "dim",
-        "title": "bold blue",
-        "subtitle": "blue",
-        "code_title": "bold cyan",
-        "optimization": "magenta",
-        "gas_saved": "green",
-        "file": "cyan",
-        "line": "dim",
-    }
+from ._ui import console
+
+try:
+    import re2 as _fence_re  # Optional linear-time engine (pip install google-re2)
+except ImportError:
+    _fence_re = re
+
+# Markdown code block with an optional language hint. Inline (?s) instead of re.DOTALL
+# because re2.compile takes an options object rather than re flags.
+_CODE_FENCE_RE = _fence_re.compile(r"(?s)```(?:(\w+)\n)?(.*?)```")
+# Only this much of a suggestion is searched for a code fence, bounding the lazy
+# match's backtracking on malformed output with many unclosed fences
+_MAX_FENCE_SCAN_CHARS = 64 * 1024
+# Any line that looks like part of a diff ("-", "+" or "@@" after indentation)
+_DIFF_LINE_RE = re.compile(r"^\s*[-+@]", re.MULTILINE)
+# Lexers for explicit code block language hints
+_LEXER_BY_HINT = {
+    "yul": "yul",
+    "assembly": "yul",
+    "diff": "diff",
+    "sol": "solidity",
+    "solidity": "solidity",
+}
+# Openings that mark an unfenced suggestion as Solidity code
+_SOLIDITY_PREFIXES = (
+    "//",
+    "contract ",
+    "function ",
+    "modifier ",
+    "event ",
+    "struct ",
+    "library ",
+    "import ",
+    "pragma ",
 )
 
-console = Console(highlight=False, theme=custom_theme)
+
+def _detect_lexer(suggestion_text: str) -> Tuple[Optional[str], str]:
+    """Picks the Syntax lexer for a stripped suggestion and the code to highlight.
+
+    Returns (None, text) when the suggestion doesn't look like code.
+    """
+    code_match = _CODE_FENCE_RE.search(suggestion_text, 0, _MAX_FENCE_SCAN_CHARS)
+    if code_match:
+        code = code_match.group(2).strip()
+        lexer = _LEXER_BY_HINT.get((code_match.group(1) or "").lower())
+        if lexer:
+            return lexer, code
+        # No usable hint; check the content
+        if _DIFF_LINE_RE.search(code):
+            return "diff", code
+        if "assembly {" in code:  # Basic check for Yul block
+            return "yul", code
+        return "solidity", code
+
+    # No markdown block; the text is stripped, so prefix checks only look at its start
+    if suggestion_text.startswith("assembly {"):
+        return "yul", suggestion_text
+    if _DIFF_LINE_RE.search(suggestion_text):
+        return "diff", suggestion_text
+    if suggestion_text.startswith(_SOLIDITY_PREFIXES):
+        return "solidity", suggestion_text
+    return None, suggestion_text  # Doesn't look like code; render as plain text
 
 
 def display_results(results: List[Dict[str, Any]], file_path: str, model_used: str):
     """Displays the analysis results for a single file in a more readable format."""
     file_name = Path(file_path).name
 
+    if not results and not console.is_terminal:
+        # Logs and pipes get one plain line instead of a rule and padded panel
+        console.file.write(
+            f"{file_name}: No gas optimizations found (model: {model_used})\n"
+        )
+        return
+
     # Create a clean header for the file
     console.rule(f"[title]Analysis: [file]{file_name}[/file][/title]")
 
@@ -85,11 +134,13 @@ def display_results(results: List[Dict[str, Any]], file_path: str, model_used: s
             if opt.get("end_line") is not None and opt["end_line"] != opt["start_line"]:
                 line_range += f"-{opt['end_line']}"
 
+        # Text cells skip markup parsing, so LLM text such as `balances[msg.sender]`
+        # is shown verbatim; the column styles still apply
         summary_table.add_row(
-            str(idx + 1),
-            line_range,
-            opt.get("description", "N/A"),
-            opt.get("estimated_gas_saved") or "N/A",
+            Text(str(idx + 1)),
+            Text(line_range),
+            Text(opt.get("description", "N/A")),
+            Text(opt.get("estimated_gas_saved") or "N/A"),
         )
 
     console.print(Padding(summary_table, (1, 2, 2, 2)))
@@ -138,65 +189,7 @@ def display_results(results: List[Dict[str, Any]], file_path: str, model_used: s
         # Suggested change
         suggestion_text = opt.get("suggested_change", "").strip()
         if suggestion_text:
-            # Try to detect code blocks in markdown format
-            code_pattern = re.compile(r"```(?:(\w+)\n)?(.*?)```", re.DOTALL)
-            code_match = code_pattern.search(suggestion_text)
-
-            lexer = "solidity"  # Default
-            code_to_highlight = suggestion_text  # Default to full text
-
-            if code_match:
-                lang_hint = (
-                    code_match.group(1) or ""
-                ).lower()  # Detected language hint
-                code_to_highlight = code_match.group(2).strip()  # Extracted code
-
-                if lang_hint in ["yul", "assembly"]:
-                    lexer = "yul"  # Use 'yul' lexer for both
-                elif lang_hint == "diff":
-                    lexer = "diff"
-                elif lang_hint in ["sol", "solidity"]:
-                    lexer = "solidity"
-                # If lang_hint is something else or empty, check content
-                elif any(
-                    line.strip().startswith(("-", "+", "@"))
-                    for line in code_to_highlight.splitlines()
-                ):
-                    lexer = "diff"
-                elif "assembly {" in code_to_highlight:  # Basic check for Yul block
-                    lexer = "yul"
-                else:
-                    lexer = "solidity"  # Fallback if hint wasn't specific enough
-
-            # If no markdown block, try basic heuristics on the whole suggestion
-            elif suggestion_text.strip().startswith("assembly {"):
-                lexer = "yul"
-                code_to_highlight = suggestion_text  # Highlight the whole thing
-            elif any(
-                line.strip().startswith(("-", "+", "@"))
-                for line in suggestion_text.splitlines()
-            ):
-                lexer = "diff"
-                code_to_highlight = suggestion_text
-            elif suggestion_text.strip().startswith(
-                (
-                    "//",
-                    "contract ",
-                    "function ",
-                    "modifier ",
-                    "event ",
-                    "struct ",
-                    "library ",
-                    "import ",
-                    "pragma ",
-                )
-            ):
-                lexer = "solidity"
-                code_to_highlight = suggestion_text
-            else:
-                # If it doesn't look like code, treat as plain text
-                lexer = None
-                code_to_highlight = suggestion_text
+            lexer, code_to_highlight = _detect_lexer(suggestion_text)
 
             panel_content.append(Text("Suggested Change:", style="muted"))  # Label
             if lexer and code_to_highlight:
@@ -1,8 +1,61 @@
+import os
+import stat
 from pathlib import Path
-from typing import List
-from rich.console import Console
+from typing import Iterator, List
 
-console = Console(highlight=False, theme=None)
+from ._ui import console
+
+# Directories that never need to be analyzed, pruned at any depth
+IGNORED_DIRECTORIES = frozenset({"node_modules", ".git"})
+# Dependency and build output directories (Foundry, Hardhat, Truffle), pruned only directly
+# under the walk root; a project's own src/lib or contracts/build folders are still walked
+ROOT_IGNORED_DIRECTORIES = IGNORED_DIRECTORIES | {
+    "lib",
+    "out",
+    "cache",
+    "artifacts",
+    "build",
+}
+
+
+def _iter_sol_entries(root: str) -> Iterator[os.DirEntry]:
+    """Lazily yields DirEntry objects for .sol files under root, pruning ignored directories."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue  # Unreadable directory; skip it rather than aborting the walk
+        ignored = ROOT_IGNORED_DIRECTORIES if directory == root else IGNORED_DIRECTORIES
+        with entries:
+            for entry in entries:
+                # DirEntry caches the file type, so no extra stat() per entry
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in ignored:
+                        stack.append(entry.path)
+                elif entry.name.lower().endswith(".sol") and entry.is_file():
+                    yield entry
+
+
+def _unique_sol_files(root: str) -> List[Path]:
+    """Walks root and returns its .sol files sorted, one path per real file.
+
+    The walk never follows directory symlinks, so a regular file's real path is the
+    root's real path plus its relative path; only symlinked files need realpath().
+    """
+    root_real = os.path.realpath(root)
+    unique_paths = {}
+    for entry in _iter_sol_entries(root):
+        if entry.is_symlink():
+            real = os.path.realpath(entry.path)
+        else:
+            # entry.path is root joined with the relative path by scandir
+            real = os.path.join(root_real, entry.path[len(root) :].lstrip(os.sep))
+        unique_paths.setdefault(real, entry.path)
+    # Split key matches Path ordering, which compares component by component
+    paths = sorted(unique_paths.values(), key=lambda p: p.split(os.sep))
+    return [Path(p) for p in paths]
 
 
 def find_solidity_files(path_pattern: str) -> List[Path]:
@@ -17,14 +70,19 @@ def find_solidity_files(path_pattern: str) -> List[Path]:
             else:
                 # Use base_path.glob for relative paths
                 files = list(base_path.glob(path_pattern))
+            # Glob matches can be directories; walker and single-file results are already files
+            files = [f for f in files if f.is_file()]
         else:
             input_path = Path(path_pattern)
-            if not input_path.exists():
+            # One stat() classifies the path instead of exists(), is_file() and is_dir()
+            try:
+                mode = os.stat(input_path).st_mode
+            except (FileNotFoundError, NotADirectoryError):
                 console.print(
                     f"[bold red]Error:[/bold red] Input path does not exist: [yellow]{path_pattern}[/yellow]"
                 )
                 return []
-            if input_path.is_file():
+            if stat.S_ISREG(mode):
                 if input_path.suffix.lower() == ".sol":
                     files = [input_path]
                 else:
@@ -32,17 +90,28 @@ def find_solidity_files(path_pattern: str) -> List[Path]:
                         f"[bold yellow]Warning:[/bold yellow] Input file is not a .sol file: [yellow]{input_path}[/yellow]"
                     )
                     files = []
-            elif input_path.is_dir():
-                # Recursively find all .sol files in the directory
-                files = list(input_path.rglob("*.sol"))
+            elif stat.S_ISDIR(mode):
+                # Recursively find all .sol files in the directory; the walker already
+                # filters, dedupes and sorts, so skip the resolve() pass below
+                sol_files = _unique_sol_files(str(input_path))
+                if not sol_files:
+                    console.print(
+                        f"[yellow]No .sol files found matching pattern:[/yellow] [cyan]{path_pattern}[/cyan]"
+                    )
+                return sol_files
             else:
                 console.print(
                     f"[bold red]Error:[/bold red] Input path is neither a file nor a directory: [yellow]{path_pattern}[/yellow]"
                 )
                 return []
 
-        # Filter one last time to ensure only files with .sol suffix are included
-        sol_files = [f for f in files if f.is_file() and f.suffix.lower() == ".sol"]
+        # Filter one last time to ensure only files with .sol suffix are included, keeping
+        # one path per real file (symlinks can reach the same file twice) in sorted order
+        unique_files = {}
+        for f in files:
+            if f.suffix.lower() == ".sol":
+                unique_files.setdefault(f.resolve(), f)
+        sol_files = sorted(unique_files.values())
 
         if not sol_files:
             console.print(
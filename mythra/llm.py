@@ -1,36 +1,13 @@
 import asyncio
-import json
 import re
-from typing import Dict, List, Optional, Any, Tuple
+import sys
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 
+import orjson
 import typer
-from rich.console import Console
-
-# LLM Client Libraries
-from openai import (
-    AsyncOpenAI,
-    RateLimitError as OpenAIRateLimitError,
-    APIError as OpenAIAPIError,
-    APIConnectionError as OpenAIAPIConnectionError,
-    BadRequestError as OpenAIBadRequestError,
-    AuthenticationError as OpenAIAuthenticationError,
-)
-import google.generativeai as genai
-from google.api_core.exceptions import (
-    ResourceExhausted as GeminiResourceExhausted,
-    GoogleAPIError as GeminiAPIError,
-    ClientError as GeminiClientError,
-    NotFound as GeminiNotFound,
-    PermissionDenied as GeminiPermissionDenied,
-)
-from anthropic import (
-    AsyncAnthropic,
-    RateLimitError as AnthropicRateLimitError,
-    APIError as AnthropicAPIError,
-    APIConnectionError as AnthropicAPIConnectionError,
-    BadRequestError as AnthropicBadRequestError,
-    AuthenticationError as AnthropicAuthenticationError,
-)
+
+from ._ui import console
 
 # Import config values
 from .config import (
@@ -43,17 +20,162 @@ from .config import (
     LLM_TIMEOUT,
     LLM_MAX_RETRIES,
     LLM_RETRY_DELAY_BASE,
+    MAX_LLM_JSON_CANDIDATE_CHARS,
+    LLM_MAX_OUTPUT_TOKENS,
+    GEMINI_MAX_OUTPUT_TOKENS,
 )
 
-console = Console(highlight=False, theme=None)
 
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates the token count of text (about 4 characters per token)."""
+    return len(text) // 4
+
+
+# Characters that matter when scanning for JSON arrays; everything else is skipped in C
+_JSON_ARRAY_TOKEN_RE = re.compile(r'[\[\]"\\]')
+
+
+def _extract_json_arrays(text: str) -> List[str]:
+    """Returns the top-level [...] spans in text, in a single linear pass.
+
+    Brackets inside JSON strings (e.g. `arr[i]` in a suggested change) are ignored, so
+    they can't unbalance the scan. Quotes are only tracked inside an array, since
+    surrounding prose may contain unpaired ones.
+    """
+    arrays = []
+    depth = 0
+    start = 0
+    in_string = False
+    skip_to = 0  # Index after an escaped character
+    for match in _JSON_ARRAY_TOKEN_RE.finditer(text):
+        i = match.start()
+        if i < skip_to:
+            continue
+        char = match.group()
+        if in_string:
+            if char == "\\":
+                skip_to = i + 2
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = depth > 0
+        elif char == "[":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif char == "]" and depth:
+            depth -= 1
+            if depth == 0:
+                arrays.append(text[start : i + 1])
+    return arrays
+
+
+class _LeadingListScanner:
+    """Follows a streamed response chunk by chunk to find where a leading JSON list ends.
+
+    Same bracket/string tracking as _extract_json_arrays, but the state carries across
+    chunks so each character is scanned once.
+    """
+
+    def __init__(self) -> None:
+        self.active = True  # False once the response is known not to open with a list
+        self._started = False
+        self._length = 0  # Characters fed so far
+        self._depth = 0
+        self._in_string = False
+        self._skip_to = 0  # Index after an escaped character, counted across chunks
+
+    def feed(self, chunk: str) -> Optional[int]:
+        """Scans the next chunk; returns the offset just past the leading list once it closes."""
+        base = self._length
+        self._length += len(chunk)
+        if not self._started:
+            stripped = chunk.lstrip()
+            if not stripped:
+                return None  # Only whitespace so far
+            self._started = True
+            if stripped[0] != "[":
+                self.active = False
+                return None
+        for match in _JSON_ARRAY_TOKEN_RE.finditer(chunk):
+            i = base + match.start()
+            if i < self._skip_to:
+                continue
+            char = match.group()
+            if self._in_string:
+                if char == "\\":
+                    self._skip_to = i + 2
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                # Always inside the list; scanning starts at its "["
+                self._in_string = True
+            elif char == "[":
+                self._depth += 1
+            elif char == "]":
+                self._depth -= 1
+                if self._depth == 0:
+                    return i + 1
+        return None
+
+
+async def _read_stream(chunks: AsyncIterator[str]) -> str:
+    """Joins streamed response text, returning as soon as a leading JSON list is complete.
+
+    The prompt asks for a single JSON list, so anything the model appends after it is
+    commentary; stopping there saves waiting for those tokens.
+    """
+    parts: List[str] = []
+    scanner = _LeadingListScanner()
+    async for text in chunks:
+        parts.append(text)
+        if not scanner.active:
+            continue
+        end = scanner.feed(text)
+        if end is None:
+            continue
+        response = "".join(parts)[:end]
+        try:
+            if isinstance(orjson.loads(response), list):
+                # Drop whatever followed the list in the last chunk, so the result (and
+                # the cached text) doesn't depend on where the stream split its chunks
+                return response
+        except orjson.JSONDecodeError:
+            pass
+        scanner.active = False  # e.g. "[Note] ..." prose; read the rest as is
+    return "".join(parts)
+
+
+# Larger "line numbers" are model noise; they would also overflow orjson's 64-bit integers
+_MAX_LINE_NUMBER = 10**7
+
+
+def _line_number(value: Any) -> Optional[int]:
+    """Returns a line number from an LLM suggestion as an int in [0, 10**7], or None."""
+    # JSON numbers arrive as int (bool is excluded) or float; strings only when the model quotes them
+    if type(value) is int:
+        line = value
+    elif isinstance(value, float) and value.is_integer():
+        line = int(value)
+    elif isinstance(value, str) and value.isdecimal() and len(value) <= 8:
+        # Length checked first; int() rejects strings over 4300 digits
+        line = int(value)
+    else:
+        return None
+    return line if 0 <= line <= _MAX_LINE_NUMBER else None
 
-def parse_llm_json_output(llm_output: str) -> List[Dict[str, Any]]:
-    """Attempts to parse JSON suggestions from the LLM response string."""
+
+def parse_llm_json_output(llm_output: str) -> Optional[List[Dict[str, Any]]]:
+    """Attempts to parse JSON suggestions from the LLM response string.
+
+    Returns None if the response holds no JSON list, so callers can report an unusable
+    reply as a failure rather than as "no optimizations". Pure CPU work; callers on the
+    event loop should run it with asyncio.to_thread.
+    """
     suggestions = []
     try:
         # Try parsing the whole string as JSON first
-        data = json.loads(llm_output)
+        data = orjson.loads(llm_output)
         if isinstance(data, list):
             suggestions = data
         elif (
@@ -66,53 +188,40 @@ def parse_llm_json_output(llm_output: str) -> List[Dict[str, Any]]:
             console.print(
                 f"[yellow]Warning:[/yellow] Parsed JSON but root is not a list or expected dict structure"
             )
-            # Fallback to regex if initial parse fails structure check
+            return None  # Valid JSON of the wrong shape; nothing to extract
 
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         console.print(
-            f"[yellow]Warning:[/yellow] LLM output was not valid JSON. Attempting regex extraction."
+            f"[yellow]Warning:[/yellow] LLM output was not valid JSON. Attempting to extract a JSON list."
         )
-        # Regex to find JSON objects within ```json ... ``` blocks or standalone
-        json_pattern = re.compile(
-            r"```(?:json)?\s*(\[.*?\])\s*```|(?<!`)(\[(?:[^\[\]]|\[[^\[\]]*\])*\])(?!`)",
-            re.DOTALL | re.MULTILINE,
-        )
-        matches = json_pattern.findall(llm_output)
-
-        if matches:
-            for match_group in matches:
-                json_str = next(
-                    (m for m in match_group if m), None
-                )  # Find the non-empty capture group
-                if json_str:
-                    try:
-                        # Basic validation: must start with [ and end with ]
-                        if json_str.strip().startswith(
-                            "["
-                        ) and json_str.strip().endswith("]"):
-                            parsed_list = json.loads(json_str)
-                            if isinstance(parsed_list, list):
-                                suggestions.extend(parsed_list)
-                                console.print(
-                                    f"[green]Successfully extracted {len(parsed_list)} suggestions via regex.[/green]"
-                                )
-                                # Don't break here, maybe there are multiple valid lists? Aggregate them.
-                            else:
-                                console.print(
-                                    f"[yellow]Warning:[/yellow] Regex found JSON, but it's not a list"
-                                )
-                        else:
-                            console.print(
-                                f"[yellow]Warning:[/yellow] Regex found potential JSON list, but structure seems invalid"
-                            )
-                    except json.JSONDecodeError:
-                        console.print(
-                            f"[yellow]Warning:[/yellow] Regex found potential JSON, but failed to parse"
-                        )
-        else:
+        candidates = _extract_json_arrays(llm_output)
+
+        found_list = False
+        for json_str in candidates:
+            # Far beyond any max_tokens response; don't spend time or memory parsing it
+            if len(json_str) > MAX_LLM_JSON_CANDIDATE_CHARS:
+                console.print(
+                    f"[yellow]Warning:[/yellow] Skipping oversized JSON list ({len(json_str)} characters)"
+                )
+                continue
+            try:
+                parsed_list = orjson.loads(json_str)
+            except orjson.JSONDecodeError:
+                console.print(
+                    f"[yellow]Warning:[/yellow] Found potential JSON list, but failed to parse"
+                )
+                continue
+            # Don't stop at the first list; aggregate every valid one
+            found_list = True
+            suggestions.extend(parsed_list)
+            console.print(
+                f"[green]Successfully extracted {len(parsed_list)} suggestions from the response.[/green]"
+            )
+        if not found_list:
             console.print(
-                f"[bold red]Error:[/bold red] Failed to parse LLM output as JSON and no JSON list found via regex."
+                f"[bold red]Error:[/bold red] Failed to parse LLM output as JSON and no JSON list found in it."
             )
+            return None
 
     # Basic validation of list items
     validated_suggestions = []
@@ -124,18 +233,8 @@ def parse_llm_json_output(llm_output: str) -> List[Dict[str, Any]]:
             and "safety_rationale" in item
         ):
             # Ensure lines are ints or None
-            item["start_line"] = (
-                int(item["start_line"])
-                if isinstance(item.get("start_line"), (int, float, str))
-                and str(item.get("start_line")).isdigit()
-                else None
-            )
-            item["end_line"] = (
-                int(item["end_line"])
-                if isinstance(item.get("end_line"), (int, float, str))
-                and str(item.get("end_line")).isdigit()
-                else None
-            )
+            item["start_line"] = _line_number(item.get("start_line"))
+            item["end_line"] = _line_number(item.get("end_line"))
             validated_suggestions.append(item)
         else:
             console.print(
@@ -145,12 +244,8 @@ def parse_llm_json_output(llm_output: str) -> List[Dict[str, Any]]:
     return validated_suggestions
 
 
-def create_gas_optimization_prompt(solidity_code: str, file_name: Optional[str]) -> str:
-    """Creates the detailed prompt for the LLM."""
-    context_fn = f" for the file '{file_name}'" if file_name else ""
-
-    # Define example JSON objects using triple quotes to avoid escaping issues
-    standard_example = """
+# Example JSON objects, defined with triple quotes to avoid escaping issues
+_STANDARD_EXAMPLE = """
 {
   "description": "Cache storage variable `owner` in memory within the loop",
   "suggested_change": "// Original:\\n// for (uint i = 0; i < addresses.length; i++) {\\n//   require(msg.sender == owner, \\\"Not owner\\\");\\n//   ...\\n// }\\n\\n// Optimized:\\naddress cachedOwner = owner;\\nfor (uint i = 0; i < addresses.length; i++) {\\n  require(msg.sender == cachedOwner, \\\"Not owner\\\");\\n  ...\\n}",
@@ -161,7 +256,7 @@ def create_gas_optimization_prompt(solidity_code: str, file_name: Optional[str])
 }
 """
 
-    safe_unchecked_example = """
+_SAFE_UNCHECKED_EXAMPLE = """
 {
   "description": "Use unchecked math for counter increments in for-loop",
   "suggested_change": "// Original:\\n// for (uint256 i = 0; i < length; i++) {\\n//   // loop body\\n// }\\n\\n// Optimized:\\nfor (uint256 i = 0; i < length;) {\\n  // loop body\\n  unchecked { ++i; }\\n}",
@@ -172,7 +267,7 @@ def create_gas_optimization_prompt(solidity_code: str, file_name: Optional[str])
 }
 """
 
-    assembly_example = """
+_ASSEMBLY_EXAMPLE = """
 {
   "description": "Use Yul assembly for efficient copying of bytes array",
   "suggested_change": "```solidity\\n// Original (example):\\n// function copyBytes(bytes memory _source) internal pure returns (bytes memory) {\\n//     bytes memory target = new bytes(_source.length);\\n//     for (uint i = 0; i < _source.length; i++) {\\n//         target[i] = _source[i];\\n//     }\\n//     return target;\\n// }\\n\\n// Optimized (using assembly):\\nfunction copyBytesAssembly(bytes memory _source) internal pure returns (bytes memory target) {\\n    assembly {\\n        target := mload(0x40) // Get free memory pointer\\n        let len := mload(_source) // Get source length\\n        mstore(target, len) // Store length in target\\n        let mc := add(target, 0x20) // Target content pointer\\n        let sc := add(_source, 0x20) // Source content pointer\\n\\n        // Copy 32 bytes at a time\\n        for { let i := 0 } lt(i, len) { i := add(i, 32) } {\\n            mstore(add(mc, i), mload(add(sc, i)))\\n        }\\n\\n        // Update free memory pointer - ensure allocation is multiple of 32\\n        let newFreePtr := add(target, add(0x20, and(add(len, 31), not(31))))\\n        mstore(0x40, newFreePtr)\\n    }\\n}\\n```",
@@ -183,9 +278,11 @@ def create_gas_optimization_prompt(solidity_code: str, file_name: Optional[str])
 }
 """
 
-    # Main prompt with references to the examples
-    prompt = f"""
-Analyze the following Solidity smart contract code{context_fn} for potential gas optimizations.
+# Static instructions sent as the system prompt. This must stay byte-for-byte identical
+# across files (no file names or other per-call data) so provider prompt caching can reuse it.
+GAS_OPTIMIZATION_SYSTEM_PROMPT = f"""You are an expert Solidity gas optimization assistant.
+
+Analyze the Solidity smart contract code provided by the user for potential gas optimizations.
 
 **Your Task:**
 1.  Identify specific areas in the code where gas usage can be reduced **without changing the core logic or introducing security vulnerabilities.** Focus on safe, commonly accepted optimizations, **but also consider advanced techniques where appropriate and demonstrably safe.**
@@ -219,131 +316,278 @@ Analyze the following Solidity smart contract code{context_fn} for potential gas
 **Example JSON Objects:**
 
 *Standard Optimization:*
-{standard_example}
+{_STANDARD_EXAMPLE}
 
 *Safe Unchecked Math Example:*
-{safe_unchecked_example}
+{_SAFE_UNCHECKED_EXAMPLE}
 
 *Advanced Optimization (Assembly Example):*
-{assembly_example}
+{_ASSEMBLY_EXAMPLE}
 
 **Important Constraints:**
 *   **SAFETY IS PARAMOUNT:** Only suggest optimizations that are **demonstrably safe** and do not change the contract's intended external behavior or security posture. **Provide a detailed safety rationale for every suggestion, especially for assembly.** If unsure about safety, do not suggest the optimization.
 *   **Output Format:** Respond ONLY with a single JSON list containing the optimization objects as described above. Do not include any introductory text, explanations outside the JSON structure, code block markers like ```json at the start/end of the entire response, or concluding remarks. If no safe optimizations are found, respond with an empty JSON list `[]`.
+"""
+
+
+def create_gas_optimization_prompt(
+    solidity_code: str, file_name: Optional[str]
+) -> Tuple[str, str]:
+    """Creates the (system_prompt, user_prompt) pair for the LLM.
 
-**Solidity Code to Analyze:**
+    The system prompt is fully static; only the user prompt varies per file.
+    """
+    context_fn = f" for the file '{file_name}'" if file_name else ""
+
+    user_prompt = f"""
+**Solidity Code to Analyze{context_fn}:**
 ```solidity
 {solidity_code}
 ```
 
 Respond ONLY with the JSON list of optimizations:
 """
-    return prompt
+    return GAS_OPTIMIZATION_SYSTEM_PROMPT, user_prompt
+
+
+@asynccontextmanager
+async def llm_client(client_type: str, api_key: str) -> AsyncIterator[Any]:
+    """Creates the client for one provider for a whole run so HTTP connections are reused.
+
+    Provider SDKs are slow to import, so only the one being used is loaded.
+    """
+    if client_type == "openai":
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(api_key=api_key, timeout=LLM_TIMEOUT)
+    elif client_type == "anthropic":
+        from anthropic import AsyncAnthropic
+
+        client = AsyncAnthropic(api_key=api_key, timeout=LLM_TIMEOUT)
+    elif client_type == "gemini":
+        import google.generativeai as genai
+
+        # google-generativeai keeps its configured transport at module level
+        genai.configure(api_key=api_key)
+        client = genai
+    else:
+        raise ValueError(f"Unsupported client type: {client_type}")
+
+    try:
+        yield client
+    finally:
+        if client_type in ("openai", "anthropic"):
+            await client.close()
+
+
+def _sdk_transport_errors(sdk: Any) -> tuple:
+    """Returns the transport error base of the HTTP library an SDK is built on, plus OSError.
+
+    The SDKs only wrap these in APIConnectionError when a request is opened, not while a
+    stream is read. SDK versions differ in which HTTP library they use, so it is found
+    through the SDK's public DefaultAsyncHttpxClient rather than imported by name.
+    """
+    client_class = getattr(sdk, "DefaultAsyncHttpxClient", None)
+    for base in getattr(client_class, "__mro__", ())[1:]:
+        http_module = sys.modules.get(base.__module__.partition(".")[0])
+        transport_error = getattr(http_module, "TransportError", None)
+        if transport_error is not None:
+            return (transport_error, OSError)
+    return (OSError,)  # Older SDKs without DefaultAsyncHttpxClient
+
+
+def _provider_exceptions(client_type: str) -> Tuple[tuple, tuple, tuple]:
+    """Returns the (retryable, auth, bad request) exception types for a provider.
+
+    Imported on demand so only the SDK in use is loaded. The retryable types are
+    broad base classes; call_llm_api re-raises the 4xx errors among them. Transport
+    errors raised mid-stream are retryable too, since the SDKs only wrap them when
+    the request is opened.
+    """
+    if client_type == "openai":
+        import openai
+        from openai import (
+            RateLimitError,
+            APIError,
+            APIConnectionError,
+            APIStatusError,
+            AuthenticationError,
+        )
+
+        return (
+            (
+                RateLimitError,
+                APIError,
+                APIConnectionError,
+                asyncio.TimeoutError,
+                *_sdk_transport_errors(openai),
+            ),
+            (AuthenticationError,),
+            (APIStatusError,),
+        )
+    if client_type == "gemini":
+        from google.api_core.exceptions import (
+            ResourceExhausted,
+            GoogleAPIError,
+            ClientError,
+            PermissionDenied,
+            Unauthenticated,
+        )
+
+        return (
+            (
+                ResourceExhausted,
+                GoogleAPIError,
+                asyncio.TimeoutError,
+                OSError,  # Socket errors while reading a stream
+            ),
+            (PermissionDenied, Unauthenticated),
+            (ClientError,),
+        )
+    if client_type == "anthropic":
+        import anthropic
+        from anthropic import (
+            RateLimitError,
+            APIError,
+            APIConnectionError,
+            APIStatusError,
+            AuthenticationError,
+        )
+
+        return (
+            (
+                RateLimitError,
+                APIError,
+                APIConnectionError,
+                asyncio.TimeoutError,
+                *_sdk_transport_errors(anthropic),
+            ),
+            (AuthenticationError,),
+            (APIStatusError,),
+        )
+    return (asyncio.TimeoutError,), (), ()
+
+
+def _is_client_error(error: Exception) -> bool:
+    """True for HTTP 4xx errors other than 429 (rate limit), which retrying can't fix."""
+    # OpenAI/Anthropic errors carry status_code; google.api_core errors carry code
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return isinstance(status, int) and 400 <= status < 500 and status != 429
+
+
+# A reply that opens with a JSON list, optionally inside a markdown code fence
+_LEADING_LIST_RE = re.compile(r"\s*(?:```\w*\s*)?\[")
+
+
+def _looks_truncated(text: str) -> bool:
+    """True if a response opened with a JSON list but never closed one."""
+    return bool(_LEADING_LIST_RE.match(text)) and not _extract_json_arrays(text)
 
 
 async def call_llm_api(
-    client_type: str, api_key: str, model_name: str, prompt: str
+    client: Any, client_type: str, model_name: str, system_prompt: str, prompt: str
 ) -> Optional[str]:
-    """Calls the appropriate LLM API using the provided key, with retry logic."""
-    console.print(f"[info]Calling {client_type} model...[/info]", end="")
-
-    # Define retryable exceptions for each client type
-    retryable_exceptions = (
-        # OpenAI
-        OpenAIRateLimitError,
-        OpenAIAPIError,
-        OpenAIAPIConnectionError,
-        # Gemini (using google.api_core.exceptions)
-        GeminiResourceExhausted,
-        GeminiAPIError,
-        # Anthropic
-        AnthropicRateLimitError,
-        AnthropicAPIError,
-        AnthropicAPIConnectionError,
-        # General asyncio timeout
-        asyncio.TimeoutError,
-    )
-    # Define non-retryable authentication/permission errors
-    auth_exceptions = (
-        OpenAIAuthenticationError,
-        GeminiPermissionDenied,
-        AnthropicAuthenticationError,
-    )
-    # Define non-retryable bad request errors (often invalid model or prompt issues)
-    bad_request_exceptions = (
-        OpenAIBadRequestError,
-        GeminiClientError,
-        GeminiNotFound,
-        AnthropicBadRequestError,
+    """Calls the appropriate LLM API using a client from llm_client, with retry logic.
+
+    The static system prompt is sent separately from the per-file user prompt so
+    providers can serve it from their prompt caches. Responses are streamed so the
+    call can return as soon as the JSON list is complete.
+    """
+    # Printed once per request; a style instead of markup skips the markup parser
+    console.print(f"Calling {client_type} model...", style="info", markup=False, end="")
+
+    retryable_exceptions, auth_exceptions, bad_request_exceptions = (
+        _provider_exceptions(client_type)
     )
 
     try:
         for attempt in range(LLM_MAX_RETRIES + 1):
+            text = None
             try:
                 if client_type == "openai":
-                    client = AsyncOpenAI(api_key=api_key, timeout=LLM_TIMEOUT)
-                    response = await client.chat.completions.create(
+                    # OpenAI caches identical prompt prefixes automatically
+                    async with await client.chat.completions.create(
                         model=model_name,
                         messages=[
-                            {
-                                "role": "system",
-                                "content": "You are an expert Solidity gas optimization assistant.",
-                            },
+                            {"role": "system", "content": system_prompt},
                             {"role": "user", "content": prompt},
                         ],
                         temperature=0.1,  # Low temperature for more deterministic responses
-                        max_tokens=4000,  # Adjust based on expected response size
-                    )
-                    if response.choices and response.choices[0].message.content:
-                        return response.choices[0].message.content
-                    else:
+                        max_tokens=LLM_MAX_OUTPUT_TOKENS,
+                        stream=True,
+                    ) as stream:
+                        text = await _read_stream(
+                            chunk.choices[0].delta.content or ""
+                            async for chunk in stream
+                            if chunk.choices
+                        )
+                    if not text:
                         console.print(
                             "[bold red]Error:[/bold red] OpenAI response structure unexpected or content missing."
                         )
                         return None  # Indicate failure
 
                 elif client_type == "gemini":
-                    genai.configure(api_key=api_key)
-                    model = genai.GenerativeModel(model_name)
+                    model = client.GenerativeModel(
+                        model_name, system_instruction=system_prompt
+                    )
                     response = await model.generate_content_async(
                         [prompt],
                         generation_config={
                             "temperature": 0.1,
-                            "max_output_tokens": 8192,
+                            "max_output_tokens": GEMINI_MAX_OUTPUT_TOKENS,
                         },
+                        stream=True,
                     )
-                    if response.text:
-                        return response.text
-                    else:
+                    text = await _read_stream(chunk.text async for chunk in response)
+                    if not text:
                         console.print(
                             "[bold red]Error:[/bold red] Gemini response structure unexpected or content missing."
                         )
                         return None  # Indicate failure
 
                 elif client_type == "anthropic":
-                    client = AsyncAnthropic(api_key=api_key, timeout=LLM_TIMEOUT)
-                    response = await client.messages.create(
+                    async with await client.messages.create(
                         model=model_name,
-                        max_tokens=4000,
-                        system="You are an expert Solidity gas optimization assistant.",
+                        max_tokens=LLM_MAX_OUTPUT_TOKENS,
+                        system=[
+                            {
+                                "type": "text",
+                                "text": system_prompt,
+                                "cache_control": {"type": "ephemeral"},
+                            }
+                        ],
                         messages=[{"role": "user", "content": prompt}],
                         temperature=0.1,
-                    )
-                    if (
-                        response.content
-                        and isinstance(response.content, list)
-                        and response.content[0].text
-                    ):
-                        return response.content[0].text
-                    else:
+                        stream=True,
+                    ) as stream:
+                        text = await _read_stream(
+                            event.delta.text
+                            async for event in stream
+                            if event.type == "content_block_delta"
+                            and event.delta.type == "text_delta"
+                        )
+                    if not text:
                         console.print(
                             "[bold red]Error:[/bold red] Anthropic response structure unexpected or content missing."
                         )
                         return None  # Indicate failure
 
-                break  # If we get here, the call succeeded
+                if text is None:
+                    break  # Unknown client type
+
+                # A list cut off at the token cap parses to nothing; fail the call so the
+                # empty result is neither cached nor recorded in the ledger
+                if _looks_truncated(text):
+                    console.print(
+                        f"[bold red]Error:[/bold red] {client_type} response was cut off at the output token limit."
+                    )
+                    return None
+                return text
 
             except retryable_exceptions as e:
+                if _is_client_error(e):
+                    raise  # Fails the same way on every attempt; handled below
                 if attempt < LLM_MAX_RETRIES:
                     wait_time = LLM_RETRY_DELAY_BASE * (
                         2**attempt
@@ -381,6 +625,15 @@ async def call_llm_api(
     return None
 
 
+# Model-name prefix -> client type, matched in one pass over the name
+_PROVIDER_BY_PREFIX = {
+    **{prefix: "gemini" for prefix in GEMINI_MODELS},
+    **{prefix: "openai" for prefix in OPENAI_MODELS},
+    **{prefix: "anthropic" for prefix in ANTHROPIC_MODELS},
+}
+_PROVIDER_PREFIX_RE = re.compile("|".join(map(re.escape, _PROVIDER_BY_PREFIX)))
+
+
 def get_client_details_for_model(
     model_name: str,
     openai_key: Optional[str],
@@ -388,13 +641,12 @@ def get_client_details_for_model(
     anthropic_key: Optional[str],
 ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
     """Determines the client type, the API key to use, and the validated model name."""
-    model_name_lower = model_name.lower()
-    client_type = None
+    prefix_match = _PROVIDER_PREFIX_RE.search(model_name.lower())
+    client_type = _PROVIDER_BY_PREFIX[prefix_match.group(0)] if prefix_match else None
     key_to_use = None
     validated_model_name = model_name  # Start with original name
 
-    if any(prefix in model_name_lower for prefix in GEMINI_MODELS):
-        client_type = "gemini"
+    if client_type == "gemini":
         key_to_use = google_key or DEFAULT_GOOGLE_API_KEY
         # Gemini might need the 'models/' prefix, ensure it's there if not provided
         if not model_name.startswith("models/"):
@@ -403,12 +655,10 @@ def get_client_details_for_model(
                 f"[dim]Prepended 'models/' to Gemini model name: {validated_model_name}[/dim]"
             )
 
-    elif any(prefix in model_name_lower for prefix in OPENAI_MODELS):
-        client_type = "openai"
+    elif client_type == "openai":
         key_to_use = openai_key or DEFAULT_OPENAI_API_KEY
 
-    elif any(prefix in model_name_lower for prefix in ANTHROPIC_MODELS):
-        client_type = "anthropic"
+    elif client_type == "anthropic":
         key_to_use = anthropic_key or DEFAULT_ANTHROPIC_API_KEY
     else:
         console.print(
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from . import cache
+from .config import (
+    PROMPT_VERSION,
+    SEMANTIC_CACHE_DIR,
+    SEMANTIC_CACHE_MODEL,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_WINDOW_CHARS,
+)
+
+# String literals are matched first so comment markers inside them are kept
+_COMMENT_RE = re.compile(
+    r"(\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*')|//[^\n]*|/\*.*?\*/", re.DOTALL
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_solidity(code: str) -> str:
+    """Strips comments and collapses whitespace so formatting-only edits look identical."""
+    code = _COMMENT_RE.sub(lambda m: m.group(1) or " ", code)
+    return _WHITESPACE_RE.sub(" ", code).strip()
+
+
+class SemanticCache:
+    """Reuses suggestions for contracts whose embeddings are near-identical to a cached one.
+
+    Requires the optional `semantic` extras (numpy and sentence-transformers). Entries
+    are kept per model and prompt version as a flat matrix searched by cosine similarity.
+    """
+
+    def __init__(self, model_name: str):
+        # Optional dependencies; ImportError is reported by the caller
+        import numpy as np
+        from sentence_transformers import SentenceTransformer
+
+        self._np = np
+        self._encoder = SentenceTransformer(SEMANTIC_CACHE_MODEL)
+        self._encode_lock = threading.Lock()
+
+        key = hashlib.sha256(
+            f"{model_name}\0{PROMPT_VERSION}".encode("utf-8")
+        ).hexdigest()[:16]
+        self._vectors_path = SEMANTIC_CACHE_DIR / f"{key}.npy"
+        self._entries_path = SEMANTIC_CACHE_DIR / f"{key}.json"
+
+        self._entries: List[Dict[str, Any]] = []
+        self._vectors = None
+        try:
+            vectors = np.load(self._vectors_path)
+            entries = cache.read_json(self._entries_path)
+            if isinstance(entries, list) and len(entries) == len(vectors):
+                self._entries, self._vectors = entries, vectors
+        except (OSError, ValueError):
+            pass  # Missing or corrupt index; start empty
+
+    def embed(self, code: str):
+        """Returns the unit-length embedding of the normalized source.
+
+        The embedding model truncates long inputs, so the source is embedded in
+        windows and the window vectors are averaged to cover the whole contract.
+        """
+        normalized = normalize_solidity(code)
+        windows = [
+            normalized[i : i + SEMANTIC_CACHE_WINDOW_CHARS]
+            for i in range(0, len(normalized), SEMANTIC_CACHE_WINDOW_CHARS)
+        ] or [""]
+        with self._encode_lock:
+            window_vectors = self._encoder.encode(
+                windows, normalize_embeddings=True, convert_to_numpy=True
+            )
+        vector = window_vectors.mean(axis=0)
+        norm = self._np.linalg.norm(vector)
+        return (vector / norm if norm else vector).astype(self._np.float32)
+
+    def lookup(self, vector, code: str) -> Optional[List[Dict[str, Any]]]:
+        """Returns cached suggestions for the closest match above the threshold, if any."""
+        if self._vectors is None or not len(self._vectors):
+            return None
+        scores = self._vectors @ vector
+        best = int(scores.argmax())
+        entry = self._entries[best]
+        # Averaged windows can't tell an appended function from a reworded one, so
+        # also require the normalized sources to be about the same length
+        length = len(normalize_solidity(code))
+        shorter, longer = sorted((length, entry["length"]))
+        if (
+            scores[best] < SEMANTIC_CACHE_THRESHOLD
+            or shorter < longer * SEMANTIC_CACHE_THRESHOLD
+        ):
+            return None
+        return entry["suggestions"]
+
+    def add(
+        self, vector, code: str, digest: str, suggestions: List[Dict[str, Any]]
+    ) -> None:
+        """Adds an analyzed contract to the index."""
+        entry = {
+            "digest": digest,
+            "length": len(normalize_solidity(code)),
+            "suggestions": suggestions,
+        }
+        if self._vectors is None:
+            self._vectors = vector[self._np.newaxis, :]
+        else:
+            self._vectors = self._np.vstack([self._vectors, vector])
+        self._entries.append(entry)
+
+    def save(self) -> None:
+        """Persists the index for the next run (best-effort, like the exact cache)."""
+        if self._vectors is None:
+            return
+        tmp_path = self._vectors_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            SEMANTIC_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                self._np.save(f, self._vectors)
+            os.replace(tmp_path, self._vectors_path)
+        except OSError:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            return
+        cache.write_json(self._entries_path, self._entries)
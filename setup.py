@@ -12,14 +12,18 @@ setup(
     packages=find_packages(),
     install_requires=[
         "typer",
-        "requests",
         "rich",
         "questionary",
         "openai",
         "anthropic",
-        "google-generativeai",
+        "google-generativeai>=0.5",
         "python-dotenv",
+        "orjson",
     ],
+    extras_require={
+        "semantic": ["numpy", "sentence-transformers"],
+        "re2": ["google-re2"],
+    },
     entry_points={"console_scripts": ["mythra = mythra.cli:app"]},
     classifiers=[
         "Programming Language :: Python :: 3",